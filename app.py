@@ -1,21 +1,46 @@
 import gradio as gr
 from state import canvas_state
 import datetime
+import functools
 import json
+import os
+import uvicorn
+from fastapi import FastAPI
+from events import ingest, sync, graph_view, workspace_html, memory_md, messages_md, state_delta
+from ingest_channel import add_ingest_route
 from components.agent_graph import create_agent_graph_image, create_state_json
+from components.render_cache import RenderCache
+from components.run_comparison import create_run_comparison_md
+from run_summary import RunArchive, diff_runs
+
+# Renders are cached per view and keyed by the version of the sections they
+# read, so repeated polls from many viewers are a lookup until the state changes.
+render_cache = RenderCache()
+
+# Finished runs are archived as compact JSON summaries for run-to-run comparisons.
+# "current" refers to the run in progress.
+run_archive = RunArchive(os.environ.get("CANVAS_RUNS_DIR", "runs"))
+CURRENT_RUN = "current"
 
 # --- UI Component Rendering Functions ---
 # These functions don't take inputs; they just read from the shared state.
 
+def _cached_render(view, sections, build):
+    # Pick up events other workers ingested, then read a consistent view
+    sync()
+    with canvas_state.lock:
+        return render_cache.get(view, canvas_state.version(*sections), build)
+
 def render_workspace():
     # In a real app, this would parse a file tree object.
     # For the prototype, we just return the raw HTML string from the state.
-    return canvas_state.workspace_html.value
+    return _cached_render("workspace", ["workspace"], workspace_html)
 
-def render_agent_graph():
+def _build_agent_graph():
     # Use the visualization component for a graphical representation
-    nodes = canvas_state.graph.value["nodes"]
-    edges = canvas_state.graph.value["edges"]
+    graph = graph_view()
+    nodes = graph["nodes"]
+    edges = graph["edges"]
     
     # Only create visualization if we have nodes
     if nodes:
@@ -25,86 +50,58 @@ def render_agent_graph():
         # If no data yet, return a placeholder
         return "<p>No agent interactions recorded yet.</p>"
 
+def render_agent_graph():
+    return _cached_render("graph", ["graph"], _build_agent_graph)
+
 def render_permanent_memory():
-    return canvas_state.permanent_memory_md.value
+    return _cached_render("permanent", ["permanent"], lambda: memory_md("permanent"))
 
 def render_task_memory():
-    return canvas_state.task_memory_md.value
+    return _cached_render("task", ["task"], lambda: memory_md("task"))
 
 def render_messages():
-    return canvas_state.messages_md.value
+    return _cached_render("messages", ["messages"], messages_md)
 
 # --- MCP Tool Implementations (API Endpoints) ---
 # These functions are the "instrumentation hooks". They are NOT displayed in the UI.
-# Their only job is to update the shared `canvas_state`.
+# Their only job is to turn each report into an event; `events.apply_event`
+# updates the shared `canvas_state` from it.
+#
+# The report tools raise ValueError when a report is rejected, so the ingestion
+# channel can tell a failed frame from a recorded one. Their API endpoints are
+# wrapped with `_tool_endpoint`, which returns the error as the tool's message.
+
+def _tool_endpoint(tool):
+    @functools.wraps(tool)
+    def endpoint(*args):
+        try:
+            return tool(*args)
+        except ValueError as e:
+            return f"Error: {str(e)}"
+    return endpoint
+
 
 def report_agent_step(agent_name: str, thought: str, tool_call: str) -> str:
     """MCP Tool: Reports an agent's thought process and action."""
-    graph = canvas_state.graph.value
-    
-    # Add nodes to the graph if they don't exist
-    graph["nodes"].add(agent_name)
-    
-    # A simple way to represent the tool call as a node
-    tool_node = f"`{tool_call.split('(')[0]}`"
-    graph["nodes"].add(tool_node)
-    
-    # Add an edge from the agent to the tool it called
-    graph["edges"].append((agent_name, tool_node))
-    
-    # This is not thread-safe, but sufficient for a single-user prototype
-    canvas_state.graph.value = graph
-    
-    # Update the messages display
-    timestamp = datetime.datetime.now().strftime("%H:%M:%S")
-    entry = f"### {timestamp} - {agent_name}\n**Thought:** {thought}\n**Action:** {tool_call}\n---\n"
-    canvas_state.messages_md.value = entry + canvas_state.messages_md.value
-    
+    ingest("agent_step", {"agent_name": agent_name, "thought": thought, "tool_call": tool_call})
     return f"Step from {agent_name} reported to Canvas."
 
 
 def report_memory_write(tier: str, key: str, value: str) -> str:
     """MCP Tool: Reports a write to the memory system."""
-    timestamp = datetime.datetime.now().strftime("%H:%M:%S")
-    entry = f"- **{timestamp} [{key}]**: {value[:100]}...\n"
-    
-    if tier == "permanent":
-        canvas_state.permanent_memory_md.value += entry
-    elif tier == "task":
-        canvas_state.task_memory_md.value += entry
-    elif tier == "volatile":
-        # Add support for volatile memory
-        if not hasattr(canvas_state, 'volatile_memory_md'):
-            canvas_state.volatile_memory_md = gr.State("### Volatile Memory\n---")
-        canvas_state.volatile_memory_md.value += entry
-        
+    ingest("memory_write", {"tier": tier, "key": key, "value": value})
     return f"Memory write to '{tier}' tier reported."
 
 
 def report_file_update(path: str, content: str) -> str:
     """MCP Tool: Reports that a file has been written or updated."""
-    # This is a simplification. A real implementation would need to handle
-    # the entire file tree. For now, we just show the latest updated file.
-    html_content = f"<h4>Last Updated: {path}</h4><pre><code>{content}</code></pre>"
-    canvas_state.workspace_html.value = html_content
+    ingest("file_update", {"path": path, "content": content})
     return f"File update for {path} reported to Canvas."
 
 
 def report_message_sent(from_agent: str, to_agent: str, message: str, priority: str = "normal") -> str:
     """MCP Tool: Reports a message sent between agents."""
-    timestamp = datetime.datetime.now().strftime("%H:%M:%S")
-    
-    # Update the graph to show message passing
-    graph = canvas_state.graph.value
-    graph["nodes"].add(from_agent)
-    graph["nodes"].add(to_agent)
-    # Add an edge for the message
-    graph["edges"].append((from_agent, to_agent))
-    canvas_state.graph.value = graph
-
-    # Update the message log
-    entry = f"- **{timestamp} [{priority.upper()}] {from_agent} → {to_agent}**: {message}\n"
-    canvas_state.messages_md.value = entry + canvas_state.messages_md.value
+    ingest("message_sent", {"from_agent": from_agent, "to_agent": to_agent, "message": message, "priority": priority})
     return "Message reported."
 
 
@@ -113,65 +110,115 @@ def full_state_snapshot(workspace_tree: str, permanent_memory: dict, task_memory
     # Parse the workspace tree (JSON string of the file structure)
     try:
         tree_data = json.loads(workspace_tree)
-        html_content = "<h3>Workspace Files</h3><ul>"
-        
-        def render_tree_node(node, path=""):
-            nonlocal html_content
-            if isinstance(node, dict):
-                # It's a directory
-                for name, child in node.items():
-                    new_path = f"{path}/{name}" if path else name
-                    html_content += f"<li><strong>{name}/</strong><ul>"
-                    render_tree_node(child, new_path)
-                    html_content += "</ul></li>"
-            elif isinstance(node, list):
-                # It's a list of files
-                for file in node:
-                    html_content += f"<li>{file}</li>"
-        
-        render_tree_node(tree_data)
-        html_content += "</ul>"
-        canvas_state.workspace_html.value = html_content
     except Exception as e:
-        return f"Error parsing workspace tree: {str(e)}"
+        raise ValueError(f"Cannot parse workspace tree: {str(e)}") from e
     
-    # Parse memory dictionaries
-    try:
-        if permanent_memory:
-            perm_content = "### Permanent Memory\n---\n"
-            for key, value in permanent_memory.items():
-                perm_content += f"- **[{key}]**: {value[:100]}...\n"
-            canvas_state.permanent_memory_md.value = perm_content
-            
-        if task_memory:
-            task_content = "### Task Memory\n---\n"
-            for key, value in task_memory.items():
-                task_content += f"- **[{key}]**: {value[:100]}...\n"
-            canvas_state.task_memory_md.value = task_content
-            
-        if volatile_memory:
-            volatile_content = "### Volatile Memory\n---\n"
-            for key, value in volatile_memory.items():
-                volatile_content += f"- **[{key}]**: {value[:100]}...\n"
-            canvas_state.volatile_memory_md.value = volatile_content
-    except Exception as e:
-        return f"Error parsing memory data: {str(e)}"
+    # Collect the memory dictionaries; values are stored as text by the event
+    memory = {}
+    for tier, tier_memory in (("permanent", permanent_memory), ("task", task_memory), ("volatile", volatile_memory)):
+        if tier_memory:
+            if not isinstance(tier_memory, dict):
+                # Keep whatever parsed before the error, as the tiers are independent
+                ingest("snapshot", {"workspace_tree": tree_data, "memory": memory})
+                raise ValueError(f"Cannot parse memory data: {tier} memory must be a dict")
+            memory[tier] = tier_memory
     
+    ingest("snapshot", {"workspace_tree": tree_data, "memory": memory})
     return "Full state snapshot received."
 
 
-# Function to generate the complete state JSON for the frontend
-def get_full_state_json():
-    state_json = create_state_json(
-        canvas_state.graph.value,
-        canvas_state.workspace_html.value,
-        canvas_state.permanent_memory_md.value,
-        canvas_state.task_memory_md.value,
-        canvas_state.volatile_memory_md.value,
-        canvas_state.messages_md.value
-    )
-    canvas_state.state_json.value = state_json
-    return state_json
+def query_events(agent: str = "", tool: str = "", tier: str = "", key: str = "", path: str = "",
+                 since: float = None, until: float = None, limit: int = 50, cursor: int = None) -> dict:
+    """MCP Tool: Queries reported events by agent, tool, memory tier/key, file path and time range."""
+    # Empty fields mean "any"; the remaining filters must all match
+    filters = {
+        field: value
+        for field, value in (("agent", agent), ("tool", tool), ("tier", tier), ("key", key), ("path", path))
+        if value
+    }
+    try:
+        since = float(since) if since is not None else None
+        until = float(until) if until is not None else None
+        limit = int(limit or 50)
+        cursor = int(cursor) if cursor is not None else None
+    except (TypeError, ValueError):
+        return {"error": "since, until, limit and cursor must be numbers"}
+    sync()
+    with canvas_state.lock:
+        return canvas_state.events.query(
+            filters,
+            since=since,
+            until=until,
+            limit=limit,
+            cursor=cursor
+        )
+
+
+def finish_run(name: str = "") -> str:
+    """MCP Tool: Marks the current run as finished and archives its summary for comparisons."""
+    name = name.strip() or datetime.datetime.now().strftime("run-%Y%m%d-%H%M%S")
+    sync()
+    with canvas_state.lock:
+        taken = name == CURRENT_RUN or name in canvas_state.finished_runs
+    if taken or run_archive.exists(name):
+        raise ValueError(f"A run named '{name}' already exists.")
+    
+    seq = ingest("run_finished", {"name": name})
+    if seq is None:
+        return f"Run '{name}' was already finished."
+    
+    # Another worker may have finished a run under the same name in the
+    # meantime; only the event applied first creates the entry
+    sync()
+    with canvas_state.lock:
+        created = canvas_state.finished_run_seqs.get(name) == seq
+        summary = canvas_state.finished_runs.get(name)
+    if not created:
+        raise ValueError(f"A run named '{name}' already exists.")
+    run_archive.save(summary)
+    return f"Run '{name}' finished with {sum(summary['events'].values())} events."
+
+
+def _load_run(name):
+    if name == CURRENT_RUN:
+        sync()
+        with canvas_state.lock:
+            return canvas_state.run.to_dict(CURRENT_RUN)
+    with canvas_state.lock:
+        summary = canvas_state.finished_runs.get(name)
+    return summary or run_archive.load(name)
+
+
+def compare_runs(run_names: str) -> str:
+    """MCP Tool: Compares runs given as comma-separated names against the first one."""
+    names = [name.strip() for name in run_names.split(",") if name.strip()]
+    if len(names) < 2:
+        available = ", ".join(run_archive.names() + [CURRENT_RUN])
+        return f"Give at least two run names to compare. Available runs: {available}"
+    
+    # Comparisons only read the stored summaries, never the raw events
+    summaries = []
+    for name in names:
+        summary = _load_run(name)
+        if summary is None:
+            return f"Unknown run '{name}'."
+        summaries.append(summary)
+    
+    diffs = [diff_runs(summaries[0], other) for other in summaries[1:]]
+    return create_run_comparison_md(diffs)
+
+
+# Function to generate the state changes JSON for the frontend
+def get_state_delta(cursor):
+    # Each poll carries the cursor of the previous one, so the frontend only
+    # receives the fragments added since. Viewers at the same cursor share one render.
+    sync()
+    with canvas_state.lock:
+        cursor = cursor or ""
+        end = len(canvas_state.events)
+        state_json = render_cache.get(f"delta:{cursor}", (end,), lambda: create_state_json(state_delta(cursor)))
+        canvas_state.state_json.value = state_json
+    return state_json, f"{canvas_state.epoch}:{end}"
 
 # Define the Gradio UI layout with enhanced JavaScript frontend
 with gr.Blocks(title="LLMunix Canvas") as demo:
@@ -195,6 +242,7 @@ with gr.Blocks(title="LLMunix Canvas") as demo:
             .tab.active { background-color: white; border-bottom: none; }
             .tab-content { display: none; padding: 15px; border: 1px solid #ddd; border-top: none; }
             .tab-content.active { display: block; }
+            .entry { margin-bottom: 8px; }
         </style>
         <!-- Load vis.js from CDN -->
         <script src="https://unpkg.com/vis-network/standalone/umd/vis-network.min.js"></script>
@@ -250,11 +298,13 @@ with gr.Blocks(title="LLMunix Canvas") as demo:
             if (selectedTab) selectedTab.classList.add('active');
         }
         
-        // Network visualization instance
+        // Network visualization instance and the nodes and edges it shows
         let network = null;
+        let graphNodes = null;
+        let graphEdges = null;
         
-        // Initialize the network visualization
-        function initNetwork(data) {
+        // Merge changed nodes and edges into the network visualization
+        function updateNetwork(graph, reset) {
             const container = document.getElementById('agent-network');
             const options = {
                 nodes: {
@@ -290,60 +340,73 @@ with gr.Blocks(title="LLMunix Canvas") as demo:
                 }
             };
             
-            // Initialize or update the network
+            // Initialize the network once; later updates only touch the changed items
             if (network === null) {
-                network = new vis.Network(container, data, options);
-            } else {
-                // Update existing network
-                network.setData(data);
+                graphNodes = new vis.DataSet();
+                graphEdges = new vis.DataSet();
+                network = new vis.Network(container, { nodes: graphNodes, edges: graphEdges }, options);
+            }
+            if (reset) {
+                graphNodes.clear();
+                graphEdges.clear();
             }
+            graphNodes.update(graph.nodes);
+            graphEdges.update(graph.edges);
         }
         
-        // Markdown rendering helper (simple version)
-        function renderMarkdown(markdown) {
-            // Very basic markdown rendering for this example
-            let html = markdown
-                .replace(/^### (.*$)/gm, '<h3>$1</h3>')
-                .replace(/^## (.*$)/gm, '<h2>$1</h2>')
-                .replace(/^# (.*$)/gm, '<h1>$1</h1>')
-                .replace(/\*\*(.*)\*\*/g, '<strong>$1</strong>')
-                .replace(/\*(.*)\*/g, '<em>$1</em>')
-                .replace(/\n/g, '<br>')
-                .replace(/- (.*)/g, '<li>$1</li>');
-                
-            return html;
+        // Insert server-rendered fragments. The server escapes all agent
+        // text, so fragments are inserted as-is and never re-rendered.
+        function insertFragments(elementId, fragments, position) {
+            if (fragments.length > 0) {
+                document.getElementById(elementId).insertAdjacentHTML(position, fragments.join(''));
+            }
         }
         
-        // Update the UI with the latest state
+        // Apply the changes since the last poll to the UI
         function updateUI(state) {
+            if (state.reset) {
+                ['permanent-memory', 'task-memory', 'volatile-memory', 'agent-messages', 'workspace-content']
+                    .forEach(id => { document.getElementById(id).innerHTML = ''; });
+            }
+            
             // Update graph visualization
-            initNetwork(state.graph);
+            if (state.graph) {
+                updateNetwork(state.graph, state.reset);
+            }
             
             // Update memory sections
-            document.getElementById('permanent-memory').innerHTML = renderMarkdown(state.memory.permanent);
-            document.getElementById('task-memory').innerHTML = renderMarkdown(state.memory.task);
-            document.getElementById('volatile-memory').innerHTML = renderMarkdown(state.memory.volatile);
+            for (const [tier, update] of Object.entries(state.memory)) {
+                const elementId = tier + '-memory';
+                if (update.reset) {
+                    document.getElementById(elementId).innerHTML = '';
+                }
+                insertFragments(elementId, update.html, 'beforeend');
+            }
             
-            // Update messages
-            document.getElementById('agent-messages').innerHTML = renderMarkdown(state.messages);
+            // Update messages, newest first
+            insertFragments('agent-messages', state.messages, 'afterbegin');
             
             // Update workspace
-            document.getElementById('workspace-content').innerHTML = state.workspace;
+            if (state.workspace !== undefined) {
+                document.getElementById('workspace-content').innerHTML = state.workspace;
+            }
         }
     </script>
     """)
     
-    # Hidden textbox to hold the JSON state for the JavaScript frontend
+    # Hidden textbox to hold the JSON state changes for the JavaScript frontend,
+    # and the cursor of the last changes this session received
     state_json_textbox = gr.Textbox(label="state_json", elem_id="state_json", value="{}", visible=False)
+    state_cursor = gr.Textbox(label="state_cursor", elem_id="state_cursor", value="", visible=False)
             
     # --- Define the API endpoints for the MCP tools ---
     # `api_name` makes these functions available as MCP tools.
     
     # Setup the real-time state update
     demo.load(
-        fn=get_full_state_json,
-        inputs=None,
-        outputs=state_json_textbox,
+        fn=get_state_delta,
+        inputs=state_cursor,
+        outputs=[state_json_textbox, state_cursor],
         every=1  # Poll every second
     )
     
@@ -363,42 +426,83 @@ with gr.Blocks(title="LLMunix Canvas") as demo:
     demo.queue()
     
     gr.Interface(
-        fn=report_agent_step,
+        fn=_tool_endpoint(report_agent_step),
         inputs=[gr.Textbox(), gr.Textbox(), gr.Textbox()],
         outputs=gr.Textbox(),
         api_name="canvas_report_step"
     )
     
     gr.Interface(
-        fn=report_memory_write,
+        fn=_tool_endpoint(report_memory_write),
         inputs=[gr.Textbox(), gr.Textbox(), gr.Textbox()],
         outputs=gr.Textbox(),
         api_name="canvas_report_memory_write"
     )
     
     gr.Interface(
-        fn=report_file_update,
+        fn=_tool_endpoint(report_file_update),
         inputs=[gr.Textbox(), gr.Textbox()],
         outputs=gr.Textbox(),
         api_name="canvas_report_file_update"
     )
     
     gr.Interface(
-        fn=report_message_sent,
+        fn=_tool_endpoint(report_message_sent),
         inputs=[gr.Textbox(), gr.Textbox(), gr.Textbox(), gr.Textbox()],
         outputs=gr.Textbox(),
         api_name="canvas_report_message_sent"
     )
     
     gr.Interface(
-        fn=full_state_snapshot,
+        fn=_tool_endpoint(full_state_snapshot),
         inputs=[gr.Textbox(), gr.JSON(), gr.JSON(), gr.JSON()],
         outputs=gr.Textbox(),
         api_name="canvas_full_state_snapshot"
     )
+    
+    gr.Interface(
+        fn=query_events,
+        inputs=[gr.Textbox(), gr.Textbox(), gr.Textbox(), gr.Textbox(), gr.Textbox(),
+                gr.Number(), gr.Number(), gr.Number(value=50), gr.Number()],
+        outputs=gr.JSON(),
+        api_name="canvas_query_events"
+    )
+    
+    gr.Interface(
+        fn=_tool_endpoint(finish_run),
+        inputs=[gr.Textbox()],
+        outputs=gr.Textbox(),
+        api_name="canvas_finish_run"
+    )
+    
+    # Run comparison view: baseline run first, e.g. "run-a, run-b, current"
+    gr.Interface(
+        fn=compare_runs,
+        inputs=[gr.Textbox(label="Runs to compare")],
+        outputs=gr.Markdown(),
+        api_name="canvas_compare_runs"
+    )
+
+# The canvas_* tools that agents can also stream over the WebSocket ingestion channel
+INGEST_TOOLS = {
+    "canvas_report_step": report_agent_step,
+    "canvas_report_memory_write": report_memory_write,
+    "canvas_report_file_update": report_file_update,
+    "canvas_report_message_sent": report_message_sent,
+    "canvas_full_state_snapshot": full_state_snapshot,
+    "canvas_finish_run": finish_run,
+}
+
+# Mount the Blocks on a plain FastAPI app so uvicorn can serve it from several
+# worker processes, e.g. `CANVAS_STATE_DB=canvas.db uvicorn app:app --workers 4`.
+# Without CANVAS_STATE_DB each worker would keep its own separate state.
+# The ingestion channel is registered first so the Gradio mount doesn't shadow it.
+app = FastAPI()
+add_ingest_route(app, INGEST_TOOLS)
+app = gr.mount_gradio_app(app, demo, path="/")
 
 # --- Launch the Server ---
-# The `launch()` method starts a FastAPI web server that serves both the
-# Gradio UI and the MCP API endpoints.
+# uvicorn serves both the Gradio UI, the MCP API endpoints and the
+# WebSocket ingestion channel from the same FastAPI app.
 if __name__ == "__main__":
-    demo.launch(server_name="0.0.0.0", server_port=7860)
\ No newline at end of file
+    uvicorn.run(app, host="0.0.0.0", port=7860)
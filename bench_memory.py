@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Memory benchmark for the canvas event storage.
+Feeds the same synthetic agent session into three representations and reports
+the bytes used per event by each:
+
+- Original: what the canvas kept before it had an event log (a node set, edge
+  tuples and pre-formatted markdown panels). Events can't be queried.
+- Dict log: the original panels plus a log of payload dicts, which is what
+  the indexed event query needed before the compact index.
+- Compact: the current event index, with every event queryable.
+"""
+
+import datetime
+import json
+import random
+import sys
+import time
+import tracemalloc
+
+AGENTS = ["SystemAgent", "SearchAgent", "CodeAgent", "ReviewAgent", "PlannerAgent"]
+TOOLS = ["search_web", "read_file", "write_file", "run_code", "delegate", "memory_store"]
+TIERS = ["permanent", "task", "volatile"]
+
+def generate_events(count, seed=0):
+    """Generate a synthetic session, decoded from JSON like real reports are."""
+    rng = random.Random(seed)
+    start = time.time() - count
+    for seq in range(1, count + 1):
+        kind = rng.random()
+        if kind < 0.5:
+            event_type = "agent_step"
+            payload = {
+                "agent_name": rng.choice(AGENTS),
+                "thought": f"Considering the next step for item {rng.randrange(10000)}",
+                "tool_call": f"{rng.choice(TOOLS)}('{rng.randrange(1000)}')",
+            }
+        elif kind < 0.75:
+            event_type = "message_sent"
+            payload = {
+                "from_agent": rng.choice(AGENTS),
+                "to_agent": rng.choice(AGENTS),
+                "message": f"Please handle request {rng.randrange(10000)}",
+                "priority": rng.choice(["low", "normal", "high"]),
+            }
+        elif kind < 0.95:
+            event_type = "memory_write"
+            payload = {
+                "tier": rng.choice(TIERS),
+                "key": f"key_{rng.randrange(200)}",
+                "value": f"Stored value {rng.randrange(10000)}",
+            }
+        else:
+            event_type = "file_update"
+            lines = rng.randrange(5, 60)
+            payload = {
+                "path": f"workspace/file_{rng.randrange(50)}.py",
+                "content": "".join(f"line {i} of <generated> output\n" for i in range(lines)),
+            }
+        # Round-trip through JSON so strings are fresh objects, as from a request
+        yield seq, start + seq, event_type, json.loads(json.dumps(payload))
+
+def ingest_original(events):
+    """The original canvas: tuple edges and markdown lines, no event log."""
+    return _ingest_panels(events, keep_log=False)
+
+def ingest_dict_log(events):
+    """The original panels plus one payload dict per event, kept for queries."""
+    return _ingest_panels(events, keep_log=True)
+
+def _ingest_panels(events, keep_log):
+    log = []
+    graph = {"nodes": set(), "edges": []}
+    messages = []
+    memory = {tier: [] for tier in TIERS}
+    workspace = ""
+    for seq, ts, event_type, payload in events:
+        if keep_log:
+            log.append((seq, ts, event_type, payload))
+        timestamp = datetime.datetime.fromtimestamp(ts).strftime("%H:%M:%S")
+        if event_type == "agent_step":
+            tool_node = f"`{payload['tool_call'].split('(')[0]}`"
+            graph["nodes"].update((payload["agent_name"], tool_node))
+            graph["edges"].append((payload["agent_name"], tool_node))
+            messages.append(
+                f"### {timestamp} - {payload['agent_name']}\n**Thought:** {payload['thought']}\n"
+                f"**Action:** {payload['tool_call']}\n---\n"
+            )
+        elif event_type == "message_sent":
+            graph["nodes"].update((payload["from_agent"], payload["to_agent"]))
+            graph["edges"].append((payload["from_agent"], payload["to_agent"]))
+            messages.append(
+                f"- **{timestamp} [{payload['priority'].upper()}] {payload['from_agent']} → "
+                f"{payload['to_agent']}**: {payload['message']}\n"
+            )
+        elif event_type == "memory_write":
+            memory[payload["tier"]].append(f"- **{timestamp} [{payload['key']}]**: {payload['value'][:100]}...\n")
+        else:
+            # Only the latest file was shown
+            workspace = f"<h4>Last Updated: {payload['path']}</h4><pre><code>{payload['content']}</code></pre>"
+    # The panels held one joined string each
+    return log, graph, "".join(messages), {tier: "".join(lines) for tier, lines in memory.items()}, workspace
+
+def ingest_compact(events):
+    """The current representation, through the same path reports take."""
+    from events import apply_event
+    from state import canvas_state
+    with canvas_state.lock:
+        for seq, ts, event_type, payload in events:
+            apply_event(seq, ts, event_type, payload)
+    return canvas_state
+
+def measure(ingest, count):
+    tracemalloc.start()
+    retained = ingest(generate_events(count))
+    used, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del retained
+    return used
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    # Import before measuring so module setup isn't counted
+    import events  # noqa: F401
+
+    original = measure(ingest_original, count)
+    dict_log = measure(ingest_dict_log, count)
+    compact = measure(ingest_compact, count)
+    print(f"Events:   {count}")
+    print(f"Original: {original / count:8.1f} bytes/event ({original / 2**20:.1f} MiB, events not queryable)")
+    print(f"Dict log: {dict_log / count:8.1f} bytes/event ({dict_log / 2**20:.1f} MiB)")
+    print(f"Compact:  {compact / count:8.1f} bytes/event ({compact / 2**20:.1f} MiB)")
+    print(f"Dict log / compact: {dict_log / compact:.2f}")
+    print(f"Original / compact: {original / compact:.2f}")
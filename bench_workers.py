@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Throughput benchmark for running the canvas as several worker processes.
+Each worker ingests events into a shared CANVAS_STATE_DB log, one event per
+write (like the MCP endpoints) or a message of frames per write (like the
+streaming channel), and then every worker polls: it replays the log into its
+own state and renders the frontend delta. Reports events/s for each worker count.
+"""
+
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+def _worker(db_path, worker_id, count, batch_size, start, results):
+    # The log location is read when `events` is imported, so import it here
+    os.environ["CANVAS_STATE_DB"] = db_path
+    import events
+
+    start.wait()
+    began = time.perf_counter()
+    for first in range(0, count, batch_size):
+        with events.ingest_batch():
+            for i in range(first, min(first + batch_size, count)):
+                events.ingest("agent_step", {
+                    "agent_name": f"Agent{worker_id}",
+                    "thought": f"Considering the next step for item {i}",
+                    "tool_call": f"tool{i % 8}('{i}')",
+                })
+    ingested = time.perf_counter()
+
+    # Every reading worker replays the whole log into its own state
+    events.sync()
+    with events.canvas_state.lock:
+        events.state_delta("")
+    results.put((began, ingested, time.perf_counter()))
+
+def run(workers, count, batch_size):
+    with tempfile.TemporaryDirectory() as directory:
+        db_path = os.path.join(directory, "canvas.db")
+        context = multiprocessing.get_context("spawn")
+        start = context.Event()
+        results = context.Queue()
+        processes = [
+            context.Process(target=_worker, args=(db_path, worker_id, count, batch_size, start, results))
+            for worker_id in range(workers)
+        ]
+        for process in processes:
+            process.start()
+        # Let every worker finish importing before starting the clock
+        time.sleep(2)
+        start.set()
+        timings = [results.get() for _ in processes]
+        for process in processes:
+            process.join()
+
+    began = min(timing[0] for timing in timings)
+    ingested = max(timing[1] for timing in timings)
+    polled = max(timing[2] for timing in timings)
+    total = workers * count
+    return total / (ingested - began), polled - ingested
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5_000
+    print(f"CPUs: {os.cpu_count()}, events per worker: {count}")
+    for batch_size in (1, 100):
+        for workers in (1, 2, 4):
+            rate, replay = run(workers, count, batch_size)
+            print(f"batch {batch_size:3d}, {workers} worker(s): ingest {rate:8.0f} events/s, "
+                  f"all replayed and polled {replay:.2f}s later")
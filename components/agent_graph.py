@@ -6,7 +6,7 @@ def create_agent_graph_image(nodes, edges):
     
     Args:
         nodes: Set of node names
-        edges: List of (source, target) tuples
+        edges: List of (source, target, count) tuples
         
     Returns:
         HTML with vis.js network visualization
@@ -23,11 +23,13 @@ def create_agent_graph_image(nodes, edges):
     
     # Convert edges to vis.js format
     vis_edges = []
-    for idx, (source, target) in enumerate(edges):
+    for idx, (source, target, count) in enumerate(edges):
         edge_data = {
             "id": f"e{idx}",
             "from": source,
             "to": target,
+            "value": count,
+            "title": f"{count}x",
             "arrows": "to"
         }
         vis_edges.append(edge_data)
@@ -102,49 +104,41 @@ def create_agent_graph_image(nodes, edges):
     
     return html
 
-def create_state_json(graph, workspace_html, permanent_memory_md, task_memory_md, volatile_memory_md, messages_md):
+def create_state_json(delta):
     """
-    Create a JSON representation of the entire application state for the JavaScript frontend.
+    Create a JSON representation of the state changes for the JavaScript frontend.
     
     Args:
-        graph: The graph state object
-        workspace_html: The workspace HTML content
-        permanent_memory_md: Permanent memory markdown content
-        task_memory_md: Task memory markdown content
-        volatile_memory_md: Volatile memory markdown content
-        messages_md: Agent messages markdown content
+        delta: State changes since the frontend's cursor, as returned by
+            `events.state_delta`. The entries are already rendered, escaped HTML
+            fragments; the optional "graph" holds node names and (source, target,
+            count) edges, to be merged into the graph the frontend has.
         
     Returns:
-        JSON string of the application state
+        JSON string of the state changes
     """
-    # Convert node set to list for JSON serialization
-    nodes_list = list(graph["nodes"])
+    state = dict(delta)
     
-    # Create a complete state object
-    state = {
-        "graph": {
+    if "graph" in delta:
+        state["graph"] = {
             "nodes": [
                 {
                     "id": node,
                     "label": node,
                     "group": "tool" if node.startswith('`') else "agent"
-                } for node in nodes_list
+                } for node in delta["graph"]["nodes"]
             ],
             "edges": [
                 {
+                    # One edge per (source, target), so updates replace its count
+                    "id": json.dumps([source, target]),
                     "from": source,
                     "to": target,
+                    "value": count,
+                    "title": f"{count}x",
                     "arrows": "to"
-                } for source, target in graph["edges"]
+                } for source, target, count in delta["graph"]["edges"]
             ]
-        },
-        "workspace": workspace_html,
-        "memory": {
-            "permanent": permanent_memory_md,
-            "task": task_memory_md,
-            "volatile": volatile_memory_md
-        },
-        "messages": messages_md
-    }
+        }
     
-    return json.dumps(state)
\ No newline at end of file
+    return json.dumps(state)
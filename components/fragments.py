@@ -0,0 +1,58 @@
+from html import escape
+
+# HTML fragments for the entries shown in the frontend panels. Fragments are
+# rendered on the server when the frontend polls for new entries, and every
+# piece of agent-provided text is escaped so it can be inserted into the page as-is.
+
+def message_fragment(timestamp, event_type, payload):
+    """
+    Render an agent step or inter-agent message for the messages panel.
+
+    Args:
+        timestamp: Formatted time of the event
+        event_type: "agent_step" or "message_sent"
+        payload: The event fields
+
+    Returns:
+        HTML fragment for the entry
+    """
+    if event_type == "agent_step":
+        return (
+            f'<div class="entry"><h3>{timestamp} - {escape(payload["agent_name"])}</h3>'
+            f'<strong>Thought:</strong> {escape(payload["thought"])}<br>'
+            f'<strong>Action:</strong> {escape(payload["tool_call"])}<hr></div>'
+        )
+    return (
+        f'<div class="entry"><strong>{timestamp} [{escape(payload["priority"].upper())}] '
+        f'{escape(payload["from_agent"])} → {escape(payload["to_agent"])}</strong>: '
+        f'{escape(payload["message"])}</div>'
+    )
+
+def memory_fragment(key, value, timestamp=None):
+    """Render a memory entry, as written at `timestamp` or from a snapshot."""
+    label = f"{timestamp} [{escape(key)}]" if timestamp else f"[{escape(key)}]"
+    return f'<div class="entry"><strong>{label}</strong>: {escape(value[:100])}...</div>'
+
+def file_fragment(path, content):
+    """Render the last updated file for the workspace panel."""
+    return f"<h4>Last Updated: {escape(path)}</h4><pre><code>{escape(content)}</code></pre>"
+
+def workspace_tree_fragment(tree):
+    """Render a workspace file tree (nested dicts of directories and lists of files)."""
+    parts = ["<h3>Workspace Files</h3><ul>"]
+
+    def render_tree_node(node):
+        if isinstance(node, dict):
+            # It's a directory
+            for name, child in node.items():
+                parts.append(f"<li><strong>{escape(str(name))}/</strong><ul>")
+                render_tree_node(child)
+                parts.append("</ul></li>")
+        elif isinstance(node, list):
+            # It's a list of files
+            for file in node:
+                parts.append(f"<li>{escape(str(file))}</li>")
+
+    render_tree_node(tree)
+    parts.append("</ul>")
+    return "".join(parts)
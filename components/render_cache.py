@@ -0,0 +1,50 @@
+import threading
+from collections import OrderedDict
+
+class RenderCache:
+    """
+    Bounded cache of rendered views, keyed by the state version they were built from.
+
+    Each view keeps only the render for its latest version: a lookup with a newer
+    version rebuilds the view and replaces the stale entry. Once more than
+    `max_entries` views are cached, the least recently used one is evicted.
+    """
+
+    def __init__(self, max_entries=32):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, view, version, build):
+        """
+        Return the cached render of `view` at `version`, building it if needed.
+
+        Args:
+            view: Name of the view being rendered
+            version: Version of the state the view depends on
+            build: Zero-argument callable producing the render
+
+        Returns:
+            The rendered view
+        """
+        with self._lock:
+            cached = self._entries.get(view)
+            if cached is not None and cached[0] == version:
+                self._entries.move_to_end(view)
+                self.hits += 1
+                return cached[1]
+            self.misses += 1
+
+        # Build outside the lock so a slow render doesn't block other views
+        rendered = build()
+
+        with self._lock:
+            self._entries[view] = (version, rendered)
+            self._entries.move_to_end(view)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+        return rendered
+
@@ -0,0 +1,68 @@
+def _format_change(change):
+    text = f"{change['before']} → {change['after']} ({change['change']:+d}"
+    if change["percent"] is not None:
+        text += f", {change['percent']:+.1f}%"
+    return text + ")"
+
+def _escape_cell(value):
+    # Keep agent and tool names from breaking the markdown table
+    return str(value).replace("|", "\\|")
+
+def create_run_comparison_md(diffs, max_edges=20):
+    """
+    Create a markdown report comparing runs against a baseline run.
+
+    Args:
+        diffs: List of diffs from `run_summary.diff_runs`, all against the same base
+        max_edges: Maximum number of changed edges to list per comparison
+
+    Returns:
+        Markdown report
+    """
+    sections = []
+    for diff in diffs:
+        lines = [
+            f"### {_escape_cell(diff['base'])} → {_escape_cell(diff['other'])}",
+            "",
+            f"**Total events:** {_format_change(diff['total_events'])}",
+            "",
+        ]
+
+        for name, change in diff["events"].items():
+            lines.append(f"- {name}: {_format_change(change)}")
+
+        if diff["tool_calls"]:
+            lines.append("\n**Tool calls:**")
+            for tool, change in diff["tool_calls"].items():
+                lines.append(f"- `{tool}`: {_format_change(change)}")
+
+        if diff["new_tools"]:
+            lines.append(f"\n**New tools:** {', '.join(f'`{tool}`' for tool in diff['new_tools'])}")
+        if diff["dropped_tools"]:
+            lines.append(f"\n**Dropped tools:** {', '.join(f'`{tool}`' for tool in diff['dropped_tools'])}")
+
+        if diff["edges"]:
+            lines += [
+                "",
+                "| Source | Target | Before | After | Change |",
+                "|---|---|---|---|---|",
+            ]
+            for edge in diff["edges"][:max_edges]:
+                lines.append(
+                    f"| {_escape_cell(edge['source'])} | {_escape_cell(edge['target'])} | "
+                    f"{edge['before']} | {edge['after']} | {edge['change']:+d} |"
+                )
+            if len(diff["edges"]) > max_edges:
+                lines.append(f"\n_{len(diff['edges']) - max_edges} more changed edges not shown._")
+        else:
+            lines.append("\nNo agent/tool edges changed.")
+
+        for tier, change in diff["memory_writes"].items():
+            lines.append(f"\n**{tier.capitalize()} memory writes:** {_format_change(change)}")
+        for tier, change in diff["memory_bytes"].items():
+            lines.append(f"\n**{tier.capitalize()} memory bytes:** {_format_change(change)}")
+        lines.append(f"\n**File updates:** {_format_change(diff['file_updates'])}")
+
+        sections.append("\n".join(lines))
+
+    return "\n\n---\n\n".join(sections)
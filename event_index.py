@@ -0,0 +1,232 @@
+import datetime
+from array import array
+from bisect import bisect_left, bisect_right
+
+EVENT_TYPES = ("agent_step", "memory_write", "file_update", "message_sent", "snapshot", "run_finished")
+_TYPE_CODES = {event_type: code for code, event_type in enumerate(EVENT_TYPES)}
+
+# Marks an empty symbol column
+NO_SYMBOL = -1
+
+
+# This class interns the names that repeat across events (agents, tools,
+# memory tiers and keys, file paths, priorities) so each distinct name is
+# stored once and events refer to it by a small integer id.
+class SymbolTable:
+    def __init__(self):
+        self.ids = {}
+        self.names = []
+
+    def __len__(self):
+        return len(self.names)
+
+    def __getitem__(self, symbol):
+        return self.names[symbol]
+
+    def intern(self, name):
+        """Return the id of `name`, adding it to the table if it is new."""
+        symbol = self.ids.get(name)
+        if symbol is None:
+            symbol = self.ids[name] = len(self.names)
+            self.names.append(name)
+        return symbol
+
+    def lookup(self, name):
+        """Return the id of `name`, or None if it has never been interned."""
+        return self.ids.get(name)
+
+
+# This class keeps every ingested event together with secondary indexes by
+# agent, tool, memory tier, memory key and file path.
+#
+# Events are stored column-wise to keep the per-event cost small: sequence
+# numbers, timestamps, types and interned names live in typed arrays, and only
+# the free text of each event (thoughts, messages, memory values, file
+# contents) is kept as a Python object, stored once.
+#
+# Events arrive in sequence order with non-decreasing timestamps, so each
+# posting list is sorted and time ranges can be found by bisection instead of
+# a scan.
+class EventIndex:
+    FIELDS = ("agent", "tool", "tier", "key", "path")
+
+    # Largest page a query returns
+    MAX_LIMIT = 1000
+
+    def __init__(self):
+        self.symbols = SymbolTable()
+
+        # Fixed-width columns, one slot per event
+        self.seqs = array("q")
+        self.times = array("d")
+        self.types = array("B")
+        self.subjects = array("i")  # agent, sender, memory tier or file path
+        self.objects = array("i")   # tool, recipient or memory key
+
+        # Out-of-line columns for the bulky text
+        self.texts = []    # thought, message, memory value, file content or workspace tree
+        self.details = []  # tool call, priority or snapshot memory
+
+        # Positions of the events under each indexed value, keyed by symbol
+        self.postings = {field: {} for field in self.FIELDS}
+
+    def __len__(self):
+        return len(self.seqs)
+
+    def add(self, seq, ts, event_type, payload):
+        """
+        Append an event and record its position under each indexed field.
+
+        Returns:
+            The position of the event in the index
+        """
+        position = len(self.seqs)
+        intern = self.symbols.intern
+        subject = obj = NO_SYMBOL
+        detail = None
+
+        if event_type == "agent_step":
+            subject = intern(payload["agent_name"])
+            obj = intern(payload["tool_call"].split('(')[0])
+            text = payload["thought"]
+            detail = payload["tool_call"]
+            self._post("agent", subject, position)
+            self._post("tool", obj, position)
+        elif event_type == "message_sent":
+            subject = intern(payload["from_agent"])
+            obj = intern(payload["to_agent"])
+            text = payload["message"]
+            # Share the interned priority string rather than keeping a copy per event
+            detail = self.symbols[intern(payload["priority"])]
+            self._post("agent", subject, position)
+            if obj != subject:
+                self._post("agent", obj, position)
+        elif event_type == "memory_write":
+            subject = intern(payload["tier"])
+            obj = intern(payload["key"])
+            text = payload["value"]
+            self._post("tier", subject, position)
+            self._post("key", obj, position)
+        elif event_type == "file_update":
+            subject = intern(payload["path"])
+            text = payload["content"]
+            self._post("path", subject, position)
+        elif event_type == "snapshot":
+            text = payload["workspace_tree"]
+            detail = payload["memory"]
+        else:
+            text = payload["name"]
+
+        self.seqs.append(seq)
+        self.times.append(ts)
+        self.types.append(_TYPE_CODES[event_type])
+        self.subjects.append(subject)
+        self.objects.append(obj)
+        self.texts.append(text)
+        self.details.append(detail)
+        return position
+
+    def _post(self, field, symbol, position):
+        postings = self.postings[field].get(symbol)
+        if postings is None:
+            postings = self.postings[field][symbol] = array("l")
+        postings.append(position)
+
+    def record(self, position):
+        """
+        Rebuild the event stored at `position`.
+
+        Returns:
+            (seq, ts, event_type, payload) tuple, with the same payload fields
+            the event was ingested with
+        """
+        event_type = EVENT_TYPES[self.types[position]]
+        names = self.symbols.names
+        subject = self.subjects[position]
+        obj = self.objects[position]
+        text = self.texts[position]
+        detail = self.details[position]
+
+        if event_type == "agent_step":
+            payload = {"agent_name": names[subject], "thought": text, "tool_call": detail}
+        elif event_type == "message_sent":
+            payload = {"from_agent": names[subject], "to_agent": names[obj], "message": text, "priority": detail}
+        elif event_type == "memory_write":
+            payload = {"tier": names[subject], "key": names[obj], "value": text}
+        elif event_type == "file_update":
+            payload = {"path": names[subject], "content": text}
+        elif event_type == "snapshot":
+            payload = {"workspace_tree": text, "memory": detail}
+        else:
+            payload = {"name": text}
+
+        return self.seqs[position], self.times[position], event_type, payload
+
+    def query(self, filters=None, since=None, until=None, limit=50, cursor=None):
+        """
+        Return the events matching every filter, newest first.
+
+        Args:
+            filters: Dict mapping indexed fields (agent, tool, tier, key, path) to values
+            since: Only include events at or after this UNIX timestamp
+            until: Only include events at or before this UNIX timestamp
+            limit: Maximum number of events to return, clamped to 1..MAX_LIMIT
+            cursor: `next_cursor` from the previous page, to continue after it
+
+        Returns:
+            Dict with the matching "events" and the "next_cursor" of the
+            following page (None when there are no more results)
+        """
+        limit = max(1, min(int(limit), self.MAX_LIMIT))
+
+        lo = bisect_left(self.times, since) if since is not None else 0
+        hi = bisect_right(self.times, until) if until is not None else len(self.seqs)
+        if cursor is not None:
+            hi = min(hi, cursor)
+        hi = max(hi, lo)
+
+        # Clip each posting list to the time range; an unknown value matches nothing
+        ranges = []
+        for field, value in (filters or {}).items():
+            if field not in self.postings:
+                raise ValueError(f"Cannot filter events by '{field}'")
+            postings = self.postings[field].get(self.symbols.lookup(value), array("l"))
+            ranges.append((postings, bisect_left(postings, lo), bisect_left(postings, hi)))
+
+        if ranges:
+            # Walk the shortest posting list and probe the others
+            ranges.sort(key=lambda r: r[2] - r[1])
+            driver, start, end = ranges[0]
+            candidates = (driver[i] for i in range(end - 1, start - 1, -1))
+            others = ranges[1:]
+        else:
+            candidates = iter(range(hi - 1, lo - 1, -1))
+            others = []
+
+        matches = []
+        for position in candidates:
+            if all(_contains(postings, start, end, position) for postings, start, end in others):
+                matches.append(position)
+                # Fetch one extra match to know whether another page exists
+                if len(matches) > limit:
+                    break
+
+        next_cursor = matches[limit - 1] if len(matches) > limit else None
+        return {
+            "events": [self._to_dict(position) for position in matches[:limit]],
+            "next_cursor": next_cursor,
+        }
+
+    def _to_dict(self, position):
+        seq, ts, event_type, payload = self.record(position)
+        return {
+            "seq": seq,
+            "time": datetime.datetime.fromtimestamp(ts).isoformat(timespec="seconds"),
+            "type": event_type,
+            **payload,
+        }
+
+
+def _contains(postings, start, end, position):
+    i = bisect_left(postings, position, start, end)
+    return i < end and postings[i] == position
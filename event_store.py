@@ -0,0 +1,132 @@
+import contextlib
+import json
+import sqlite3
+import threading
+import time
+
+# This class holds the shared event log used when the canvas runs as several
+# worker processes. Every worker appends the events it ingests, and workers
+# that serve reads replay the log, so they all converge on the same state.
+class SQLiteEventStore:
+    def __init__(self, path):
+        self.path = path
+        # sqlite3 connections can't be shared across threads, so keep one per thread
+        self._local = threading.local()
+
+        conn = self._connection()
+        # WAL lets pollers read while another worker is appending
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS events ("
+            "seq INTEGER PRIMARY KEY AUTOINCREMENT, "
+            "ts REAL NOT NULL, "
+            "type TEXT NOT NULL, "
+            "payload TEXT NOT NULL)"
+        )
+        # The last sequence number ingested from each streaming producer
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS producers ("
+            "producer TEXT PRIMARY KEY, "
+            "seq INTEGER NOT NULL)"
+        )
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @contextlib.contextmanager
+    def transaction(self):
+        """
+        Group the appends made by this thread inside the block into one write
+        transaction, committed when the block exits (rolled back if it raises).
+        """
+        conn = self._connection()
+        if conn.in_transaction:
+            # Already inside an enclosing transaction
+            yield
+            return
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def append(self, event_type, payload, producer=None, producer_seq=None):
+        """
+        Append an event to the shared log.
+
+        The timestamp is taken inside the write transaction, so timestamps
+        never go backwards along the sequence even with many writers. Inside
+        `transaction()` the event is committed with the rest of the block.
+
+        Args:
+            event_type: Name of the event (e.g. "agent_step")
+            payload: JSON-serializable dict of event fields
+            producer: Streaming producer the event came from, if any
+            producer_seq: The producer's sequence number for the event
+
+        Returns:
+            (seq, ts) tuple of the stored event, or None if the producer
+            already delivered this sequence number
+        """
+        conn = self._connection()
+        with self.transaction():
+            # A savepoint undoes a failed append without the rest of an
+            # enclosing transaction
+            conn.execute("SAVEPOINT append")
+            try:
+                if producer is not None:
+                    # Record the producer's position in the same transaction as the
+                    # event, so a resent frame is never applied twice
+                    row = conn.execute("SELECT seq FROM producers WHERE producer = ?", (producer,)).fetchone()
+                    if row is not None and producer_seq <= row[0]:
+                        conn.execute("RELEASE append")
+                        return None
+                    conn.execute(
+                        "INSERT INTO producers (producer, seq) VALUES (?, ?) "
+                        "ON CONFLICT(producer) DO UPDATE SET seq = excluded.seq",
+                        (producer, producer_seq)
+                    )
+                ts = time.time()
+                cursor = conn.execute(
+                    "INSERT INTO events (ts, type, payload) VALUES (?, ?, ?)",
+                    (ts, event_type, json.dumps(payload))
+                )
+                conn.execute("RELEASE append")
+            except Exception:
+                conn.execute("ROLLBACK TO append")
+                conn.execute("RELEASE append")
+                raise
+        return cursor.lastrowid, ts
+
+    def read_since(self, seq, limit=None):
+        """
+        Return the events appended after `seq`, oldest first.
+
+        Args:
+            seq: Sequence number of the last event already read
+            limit: Maximum number of events to return, or None for all of them
+
+        Returns:
+            List of (seq, ts, type, payload) tuples
+        """
+        query = "SELECT seq, ts, type, payload FROM events WHERE seq > ? ORDER BY seq"
+        params = (seq,)
+        if limit is not None:
+            query += " LIMIT ?"
+            params += (limit,)
+        rows = self._connection().execute(query, params).fetchall()
+        return [(row_seq, ts, event_type, json.loads(payload)) for row_seq, ts, event_type, payload in rows]
+
+    def producer_seq(self, producer):
+        """Return the last sequence number ingested from `producer`, or 0."""
+        row = self._connection().execute(
+            "SELECT seq FROM producers WHERE producer = ?", (producer,)
+        ).fetchone()
+        return row[0] if row is not None else 0
@@ -0,0 +1,423 @@
+import contextlib
+import contextvars
+import datetime
+import logging
+import os
+import time
+from array import array
+from bisect import bisect_left
+from state import canvas_state
+from event_index import EVENT_TYPES
+from event_store import SQLiteEventStore
+from run_summary import RunSummary
+from components.fragments import message_fragment, memory_fragment, file_fragment, workspace_tree_fragment
+
+# Every MCP report becomes an event. Events are appended to a log and then
+# applied to `canvas_state`, so the state is the same no matter which worker
+# process received the report.
+#
+# Set CANVAS_STATE_DB to a file path to share the log between worker processes.
+# Ingesting then only appends to the log; a worker replays the log into its
+# own state when it serves a read. Without it, events are applied directly to
+# the in-process state.
+STATE_DB_PATH = os.environ.get("CANVAS_STATE_DB")
+event_store = SQLiteEventStore(STATE_DB_PATH) if STATE_DB_PATH else None
+
+# Number of log entries read into memory at a time while replaying
+SYNC_BATCH = 1000
+
+logger = logging.getLogger(__name__)
+
+
+# The streaming producer frame being ingested, set by the ingestion channel
+# around the MCP tool call that handles the frame
+_producer_frame = contextvars.ContextVar("producer_frame", default=None)
+
+
+@contextlib.contextmanager
+def producer_frame(producer, seq):
+    """Attribute the events ingested inside the block to frame `seq` of `producer`."""
+    token = _producer_frame.set((producer, seq))
+    try:
+        yield
+    finally:
+        _producer_frame.reset(token)
+
+
+@contextlib.contextmanager
+def ingest_batch():
+    """Write the events ingested inside the block to the shared log in one transaction."""
+    if event_store is None:
+        yield
+        return
+    with event_store.transaction():
+        yield
+
+
+def producer_seq(producer):
+    """Return the last frame sequence number ingested from `producer`, or 0."""
+    if event_store is not None:
+        return event_store.producer_seq(producer)
+    with canvas_state.lock:
+        return canvas_state.producer_seqs.get(producer, 0)
+
+
+def ingest(event_type, payload):
+    """
+    Record an event. With a shared log the event is only appended; call
+    `sync` to apply it to the local state.
+
+    Events from a streaming producer frame that was already ingested are
+    dropped, so producers can safely resend after a reconnect.
+
+    Returns:
+        The sequence number of the event, or None if it was dropped as part
+        of an already ingested producer frame
+
+    Raises:
+        ValueError: If the event is invalid. Nothing is recorded.
+    """
+    producer, frame_seq = _producer_frame.get() or (None, None)
+
+    # Check the event before it reaches the log, where every worker would replay it
+    payload = normalize_event(event_type, payload)
+
+    if event_store is None:
+        with canvas_state.lock:
+            if producer is not None and frame_seq <= canvas_state.producer_seqs.get(producer, 0):
+                return None
+            seq = canvas_state.last_seq + 1
+            apply_event(seq, time.time(), event_type, payload)
+            # Only count the frame as ingested once its event is in the state
+            if producer is not None:
+                canvas_state.producer_seqs[producer] = frame_seq
+        return seq
+
+    stored = event_store.append(event_type, payload, producer, frame_seq)
+    return stored[0] if stored else None
+
+
+def sync():
+    """Apply the events appended to the shared log since this worker last synced."""
+    if event_store is None:
+        return
+    with canvas_state.lock:
+        while True:
+            # Read in batches so catching up on a long log doesn't load it whole
+            batch = event_store.read_since(canvas_state.last_seq, SYNC_BATCH)
+            for seq, ts, event_type, payload in batch:
+                try:
+                    apply_event(seq, ts, event_type, payload)
+                except ValueError as e:
+                    # Skip an entry that can't be applied (e.g. written by an older
+                    # version) rather than failing on it at every sync
+                    logger.warning("Skipping event %d that can't be applied: %s", seq, e)
+                    canvas_state.last_seq = seq
+            if len(batch) < SYNC_BATCH:
+                return
+
+
+# The fields of each event type whose values are stored as text
+_TEXT_FIELDS = {
+    "agent_step": ("agent_name", "thought", "tool_call"),
+    "memory_write": ("tier", "key", "value"),
+    "file_update": ("path", "content"),
+    "message_sent": ("from_agent", "to_agent", "message", "priority"),
+    "run_finished": ("name",),
+}
+
+
+def normalize_event(event_type, payload):
+    """
+    Check an event and convert its fields to the types the state stores.
+
+    Returns:
+        The normalized payload, holding only the fields of `event_type`
+
+    Raises:
+        ValueError: If the event is of an unknown type or misses fields
+    """
+    if not isinstance(payload, dict):
+        raise ValueError(f"'{event_type}' event payload must be a dict")
+
+    if event_type == "snapshot":
+        memory = payload.get("memory")
+        if "workspace_tree" not in payload or not isinstance(memory, dict) \
+                or not all(isinstance(entries, dict) for entries in memory.values()):
+            raise ValueError("'snapshot' events need a workspace tree and a dict of entries per memory tier")
+        # Keep only the part of each memory value the panels show
+        return {
+            "workspace_tree": payload["workspace_tree"],
+            "memory": {
+                str(tier): {str(key): str(value)[:100] for key, value in entries.items()}
+                for tier, entries in memory.items()
+            },
+        }
+
+    fields = _TEXT_FIELDS.get(event_type)
+    if fields is None:
+        raise ValueError(f"Unknown event type '{event_type}'")
+    missing = [field for field in fields if payload.get(field) is None]
+    if missing:
+        raise ValueError(f"'{event_type}' events need {', '.join(missing)}")
+    return {field: str(payload[field]) for field in fields}
+
+
+def apply_event(seq, ts, event_type, payload):
+    """
+    Apply a single event to `canvas_state`. Callers must hold `canvas_state.lock`.
+
+    Raises:
+        ValueError: If the event can't be applied. The state is left unchanged.
+    """
+    # Everything that can fail runs before the state is touched, so an event
+    # is either applied completely or not at all
+    payload = normalize_event(event_type, payload)
+    workspace = None
+    if event_type in ("file_update", "snapshot"):
+        try:
+            workspace = _render_workspace(event_type, payload)
+        except Exception as e:
+            raise ValueError(f"Cannot render '{event_type}' event: {str(e)}") from e
+
+    position = canvas_state.events.add(seq, ts, event_type, payload)
+    if workspace is not None:
+        canvas_state.workspace_fragment = workspace
+    if event_type != "run_finished":
+        canvas_state.run.add(ts, event_type, payload)
+    _APPLY[event_type](position, **payload)
+    canvas_state.last_seq = seq
+
+
+def _render_workspace(event_type, payload):
+    # The workspace panel only ever shows the latest file or tree, so its one
+    # fragment is rendered as the event is applied
+    if event_type == "file_update":
+        return file_fragment(payload["path"], payload["content"])
+    return workspace_tree_fragment(payload["workspace_tree"])
+
+
+def _add_edge(source, target):
+    # Add nodes to the graph if they don't exist, then count the edge between them
+    graph = canvas_state.graph
+    graph["nodes"].add(source)
+    graph["nodes"].add(target)
+    graph["edges"][(source, target)] = graph["edges"].get((source, target), 0) + 1
+
+
+def _edge_at(position):
+    # The (source, target) edge added by the step or message at `position`
+    events = canvas_state.events
+    source = events.subjects[position]
+    target = events.objects[position]
+    if EVENT_TYPES[events.types[position]] == "agent_step":
+        # Steps point at the tool's node rather than the tool name
+        target = events.symbols.lookup(f"`{events.symbols[target]}`")
+    return source, target
+
+
+def _apply_agent_step(position, agent_name, thought, tool_call):
+    symbols = canvas_state.events.symbols
+
+    # A simple way to represent the tool call as a node
+    tool_node = symbols.intern(f"`{tool_call.split('(')[0]}`")
+
+    # Add an edge from the agent to the tool it called
+    _add_edge(symbols.intern(agent_name), tool_node)
+
+    # Update the messages display
+    canvas_state.message_rows.append(position)
+    canvas_state.touch("graph", "messages")
+
+
+def _apply_memory_write(position, tier, key, value):
+    if tier in canvas_state.memory_rows:
+        canvas_state.memory_rows[tier].append(position)
+        canvas_state.touch(tier)
+
+
+def _apply_file_update(position, path, content):
+    # This is a simplification. A real implementation would need to handle
+    # the entire file tree. For now, we just show the latest updated file.
+    canvas_state.workspace_row = position
+    canvas_state.touch("workspace")
+
+
+def _apply_message_sent(position, from_agent, to_agent, message, priority):
+    # Update the graph to show message passing
+    symbols = canvas_state.events.symbols
+    _add_edge(symbols.intern(from_agent), symbols.intern(to_agent))
+
+    # Update the message log
+    canvas_state.message_rows.append(position)
+    canvas_state.touch("graph", "messages")
+
+
+def _apply_snapshot(position, workspace_tree, memory):
+    # The snapshot replaces each section it covers
+    canvas_state.workspace_row = position
+    canvas_state.touch("workspace")
+    for tier, entries in memory.items():
+        if tier not in canvas_state.memory_rows:
+            continue
+        title = tier.capitalize()
+        canvas_state.memory_base[tier] = f"### {title} Memory\n---\n" + "".join(
+            f"- **[{key}]**: {value}...\n" for key, value in entries.items()
+        )
+        canvas_state.memory_base_html[tier] = "".join(
+            memory_fragment(key, value) for key, value in entries.items()
+        )
+        canvas_state.memory_base_row[tier] = position
+        canvas_state.memory_rows[tier] = array("l")
+        canvas_state.touch(tier)
+
+
+def _apply_run_finished(position, name):
+    # Names are checked here, in log order, so when two workers finish a run
+    # under the same name only the first one counts; the other is ignored and
+    # the current run carries on
+    if name in canvas_state.finished_runs:
+        return
+    # Keep the finished run's summary and start aggregating a new one
+    canvas_state.finished_runs[name] = canvas_state.run.to_dict(name)
+    canvas_state.finished_run_seqs[name] = canvas_state.events.seqs[position]
+    canvas_state.run = RunSummary()
+
+
+_APPLY = {
+    "agent_step": _apply_agent_step,
+    "memory_write": _apply_memory_write,
+    "file_update": _apply_file_update,
+    "message_sent": _apply_message_sent,
+    "snapshot": _apply_snapshot,
+    "run_finished": _apply_run_finished,
+}
+
+
+# --- Panel rendering ---
+# Panels are rendered from the event index when they are requested, so the
+# text of each event is stored only once. Callers must hold `canvas_state.lock`.
+
+def _format_time(ts):
+    return datetime.datetime.fromtimestamp(ts).strftime("%H:%M:%S")
+
+
+def graph_view(edges=None):
+    """
+    Return the agent graph with node names resolved.
+
+    Args:
+        edges: Only include these (source, target) symbol pairs and their
+            nodes, or None for the whole graph
+
+    Returns:
+        Dict with the "nodes" and the "edges" as (source, target, count) tuples
+    """
+    names = canvas_state.events.symbols.names
+    graph = canvas_state.graph
+    if edges is None:
+        nodes = graph["nodes"]
+        edges = graph["edges"]
+    else:
+        nodes = {node for edge in edges for node in edge}
+    return {
+        "nodes": {names[node] for node in nodes},
+        "edges": [(names[source], names[target], graph["edges"][(source, target)]) for source, target in edges],
+    }
+
+
+def workspace_html():
+    return canvas_state.workspace_fragment
+
+
+def memory_md(tier):
+    content = canvas_state.memory_base[tier]
+    for position in canvas_state.memory_rows[tier]:
+        _, ts, _, payload = canvas_state.events.record(position)
+        content += f"- **{_format_time(ts)} [{payload['key']}]**: {payload['value'][:100]}...\n"
+    return content
+
+
+def messages_md():
+    # Newest messages first, above the header
+    entries = []
+    for position in reversed(canvas_state.message_rows):
+        _, ts, event_type, payload = canvas_state.events.record(position)
+        timestamp = _format_time(ts)
+        if event_type == "agent_step":
+            entries.append(
+                f"### {timestamp} - {payload['agent_name']}\n"
+                f"**Thought:** {payload['thought']}\n**Action:** {payload['tool_call']}\n---\n"
+            )
+        else:
+            entries.append(
+                f"- **{timestamp} [{payload['priority'].upper()}] "
+                f"{payload['from_agent']} → {payload['to_agent']}**: {payload['message']}\n"
+            )
+    entries.append(canvas_state.messages_header)
+    return "".join(entries)
+
+
+def _entry_fragment(position):
+    # Render a message or memory entry from the index, which holds the only
+    # copy of its text
+    _, ts, event_type, payload = canvas_state.events.record(position)
+    timestamp = _format_time(ts)
+    if event_type == "memory_write":
+        return memory_fragment(payload["key"], payload["value"], timestamp)
+    return message_fragment(timestamp, event_type, payload)
+
+
+def state_delta(cursor):
+    """
+    Return the HTML fragments added since the frontend last polled.
+
+    Args:
+        cursor: The "cursor" returned by the previous poll, or "" for a full state
+
+    Returns:
+        Dict with the new "cursor", whether the client must "reset" its panels,
+        the agent "graph" edges that changed with their current counts, new
+        "messages" fragments (newest
+        first), new "memory" fragments per tier and the "workspace" fragment
+        if it changed
+    """
+    end = len(canvas_state.events)
+    # Cursors are "<epoch>:<position>". One from another state (e.g. before a
+    # restart) can't be continued, whatever its position, so start over.
+    epoch, _, position = str(cursor or "").partition(":")
+    reset = epoch != canvas_state.epoch or not position.isdigit() or not 0 < int(position) <= end
+    cursor = 0 if reset else int(position)
+
+    message_rows = canvas_state.message_rows
+    new_messages = message_rows[bisect_left(message_rows, cursor):]
+    delta = {
+        "cursor": f"{canvas_state.epoch}:{end}",
+        "reset": reset,
+        "messages": [_entry_fragment(position) for position in reversed(new_messages)],
+        "memory": {},
+    }
+
+    # Every step and message adds to an edge, so only the edges of the new
+    # ones need sending; the client merges them into the graph it has
+    if reset:
+        delta["graph"] = graph_view()
+    elif new_messages:
+        delta["graph"] = graph_view(dict.fromkeys(_edge_at(position) for position in new_messages))
+
+    for tier, rows in canvas_state.memory_rows.items():
+        base_row = canvas_state.memory_base_row[tier]
+        if reset or (base_row is not None and base_row >= cursor):
+            # A snapshot replaced this tier, so send it whole
+            html = [canvas_state.memory_base_html[tier]] + [_entry_fragment(position) for position in rows]
+            delta["memory"][tier] = {"reset": True, "html": html}
+        else:
+            new_rows = rows[bisect_left(rows, cursor):]
+            if new_rows:
+                html = [_entry_fragment(position) for position in new_rows]
+                delta["memory"][tier] = {"reset": False, "html": html}
+
+    if canvas_state.workspace_row is not None and (reset or canvas_state.workspace_row >= cursor):
+        delta["workspace"] = canvas_state.workspace_fragment
+
+    return delta
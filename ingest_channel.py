@@ -0,0 +1,130 @@
+import inspect
+import json
+from fastapi import WebSocket, WebSocketDisconnect
+from starlette.concurrency import run_in_threadpool
+from events import ingest_batch, producer_frame, producer_seq
+
+# A long-lived WebSocket channel for agents that report many events.
+#
+# Protocol:
+#   1. The producer connects to /ingest?producer=<id>, using the same id
+#      every time it reconnects.
+#   2. The server replies {"resume_from": n}: the last sequence number it has
+#      ingested from that producer. The producer resends everything after it.
+#   3. The producer sends frames {"seq": n, "tool": "<canvas_* tool>", "data": [...]},
+#      one per message or as a JSON list. `seq` starts at 1 and increases by 1;
+#      `data` is a list of the same inputs as the tool's /run endpoint.
+#   4. After each message the server replies {"ack": n}, acknowledging every
+#      frame up to and including n. Resent frames at or below the last
+#      ingested sequence number are acknowledged but not applied again.
+#   5. On a bad or rejected frame the server replies {"ack": n, "error": "..."},
+#      where n is the last frame it stored, and closes.
+#
+# The tools raise ValueError when they reject a report (see app.py), so a frame
+# is only acknowledged once its event is recorded.
+
+def add_ingest_route(app, tools, path="/ingest"):
+    """
+    Register the WebSocket ingestion channel on a FastAPI app.
+
+    Args:
+        app: The FastAPI app to register the route on
+        tools: Dict mapping canvas_* tool names to the functions handling them.
+            The functions must raise on failure rather than return an error.
+        path: URL path of the channel
+    """
+    signatures = {name: inspect.signature(tool) for name, tool in tools.items()}
+
+    @app.websocket(path)
+    async def ingest_channel(websocket: WebSocket, producer: str):
+        await websocket.accept()
+        last_seq = await run_in_threadpool(producer_seq, producer)
+        await websocket.send_json({"resume_from": last_seq})
+
+        try:
+            while True:
+                message = await websocket.receive_text()
+                last_seq, error = await run_in_threadpool(
+                    _apply_frames, tools, signatures, producer, last_seq, message
+                )
+                reply = {"ack": last_seq}
+                if error:
+                    reply["error"] = error
+                await websocket.send_json(reply)
+                if error:
+                    await websocket.close(code=1008)
+                    return
+        except WebSocketDisconnect:
+            pass
+
+
+def _check_data(signature, data):
+    """Return an error message if `data` doesn't match the tool's inputs, else None."""
+    if not isinstance(data, list):
+        return "'data' must be a list"
+    params = list(signature.parameters.values())
+    required = sum(1 for param in params if param.default is inspect.Parameter.empty)
+    if not required <= len(data) <= len(params):
+        expected = required if required == len(params) else f"{required} to {len(params)}"
+        return f"Expected {expected} inputs, got {len(data)}"
+    for param, value in zip(params, data):
+        # Optional inputs may be null when their default is
+        if value is None and param.default is None:
+            continue
+        if not isinstance(value, param.annotation):
+            return f"'{param.name}' must be of type {param.annotation.__name__}"
+    return None
+
+
+def _apply_frames(tools, signatures, producer, last_seq, message):
+    """Apply the frames of one message in order. Returns (last_seq, error)."""
+    # One write to the shared log per message rather than per frame. Frames
+    # before a failed one are still committed, matching the ack.
+    with ingest_batch():
+        return _apply_message(tools, signatures, producer, last_seq, message)
+
+
+def _apply_message(tools, signatures, producer, last_seq, message):
+    try:
+        frames = json.loads(message)
+    except json.JSONDecodeError as e:
+        return last_seq, f"Invalid JSON: {str(e)}"
+    if isinstance(frames, dict):
+        frames = [frames]
+    elif not isinstance(frames, list):
+        return last_seq, "Messages must be a frame or a list of frames"
+
+    for frame in frames:
+        try:
+            seq = int(frame["seq"])
+            tool = frame["tool"]
+            data = frame["data"]
+        except (KeyError, TypeError, ValueError):
+            return last_seq, "Frames need 'seq', 'tool' and 'data' fields"
+
+        if seq <= last_seq:
+            # Already ingested before a reconnect
+            continue
+        if seq != last_seq + 1:
+            return last_seq, f"Expected seq {last_seq + 1}, got {seq}"
+        if tool not in tools:
+            return last_seq, f"Unknown tool '{tool}'"
+
+        error = _check_data(signatures[tool], data)
+        if error:
+            return last_seq, f"Bad data for '{tool}': {error}"
+
+        try:
+            with producer_frame(producer, seq):
+                tools[tool](*data)
+        except Exception as e:
+            # A tool may have recorded its event before failing (e.g. a
+            # partial snapshot), so acknowledge what was actually stored
+            return producer_seq(producer), f"Failed to apply frame {seq}: {str(e)}"
+        last_seq = seq
+
+    # Never acknowledge past the producer position that was stored
+    stored = producer_seq(producer)
+    if stored < last_seq:
+        return stored, f"Frames after {stored} were not recorded"
+    return last_seq, None
@@ -0,0 +1,150 @@
+import json
+import os
+import re
+from collections import Counter
+
+# This class aggregates a run as its events are applied: the agent/tool graph
+# with call counts, memory write volume per tier and file update counts.
+# It only grows with the number of distinct names, not with the number of
+# events, so finished runs can be kept and compared cheaply.
+class RunSummary:
+    def __init__(self):
+        self.started = None
+        self.finished = None
+        self.events = Counter()         # event type -> count
+        self.edges = Counter()          # (source, target) -> count
+        self.tools = Counter()          # tool name -> calls
+        self.memory_writes = Counter()  # tier -> writes
+        self.memory_bytes = Counter()   # tier -> bytes written
+        self.file_updates = Counter()   # path -> updates
+
+    def add(self, ts, event_type, payload):
+        """Fold one applied event into the summary."""
+        if self.started is None:
+            self.started = ts
+        self.finished = ts
+        self.events[event_type] += 1
+
+        if event_type == "agent_step":
+            tool = payload["tool_call"].split('(')[0]
+            self.tools[tool] += 1
+            self.edges[(payload["agent_name"], f"`{tool}`")] += 1
+        elif event_type == "message_sent":
+            self.edges[(payload["from_agent"], payload["to_agent"])] += 1
+        elif event_type == "memory_write":
+            self.memory_writes[payload["tier"]] += 1
+            self.memory_bytes[payload["tier"]] += len(payload["value"].encode("utf-8"))
+        elif event_type == "file_update":
+            self.file_updates[payload["path"]] += 1
+
+    def to_dict(self, name):
+        """Return the summary as a JSON-serializable dict."""
+        return {
+            "name": name,
+            "started": self.started,
+            "finished": self.finished,
+            "events": dict(self.events),
+            "edges": [[source, target, count] for (source, target), count in self.edges.items()],
+            "tools": dict(self.tools),
+            "memory_writes": dict(self.memory_writes),
+            "memory_bytes": dict(self.memory_bytes),
+            "file_updates": dict(self.file_updates),
+        }
+
+
+def diff_runs(base, other):
+    """
+    Compare two run summaries (as returned by `RunSummary.to_dict`).
+
+    Returns:
+        Dict describing how `other` differs from `base`: total and per-type
+        event volume, edges that grew, shrank, appeared or disappeared, tools
+        introduced or dropped, and memory and file update changes
+    """
+    base_edges = {(source, target): count for source, target, count in base["edges"]}
+    other_edges = {(source, target): count for source, target, count in other["edges"]}
+
+    edges = []
+    for edge in base_edges.keys() | other_edges.keys():
+        before = base_edges.get(edge, 0)
+        after = other_edges.get(edge, 0)
+        if before != after:
+            edges.append({"source": edge[0], "target": edge[1], "before": before, "after": after, "change": after - before})
+    # Biggest changes first
+    edges.sort(key=lambda e: (-abs(e["change"]), e["source"], e["target"]))
+
+    base_total = sum(base["events"].values())
+    other_total = sum(other["events"].values())
+
+    return {
+        "base": base["name"],
+        "other": other["name"],
+        "total_events": _change(base_total, other_total),
+        "events": _counter_changes(base["events"], other["events"]),
+        "edges": edges,
+        "new_tools": sorted(other["tools"].keys() - base["tools"].keys()),
+        "dropped_tools": sorted(base["tools"].keys() - other["tools"].keys()),
+        "tool_calls": _counter_changes(base["tools"], other["tools"]),
+        "memory_writes": _counter_changes(base["memory_writes"], other["memory_writes"]),
+        "memory_bytes": _counter_changes(base["memory_bytes"], other["memory_bytes"]),
+        "file_updates": _change(sum(base["file_updates"].values()), sum(other["file_updates"].values())),
+    }
+
+
+def _change(before, after):
+    percent = (after - before) / before * 100 if before else None
+    return {"before": before, "after": after, "change": after - before, "percent": percent}
+
+
+def _counter_changes(base, other):
+    return {
+        name: _change(base.get(name, 0), other.get(name, 0))
+        for name in sorted(base.keys() | other.keys())
+        if base.get(name, 0) != other.get(name, 0)
+    }
+
+
+# This class keeps finished run summaries as one JSON file per run, so they
+# outlive the server and can be shared by every worker process on the host.
+class RunArchive:
+    def __init__(self, directory):
+        self.directory = directory
+
+    def _path(self, name):
+        # Keep run names from escaping the archive directory
+        return os.path.join(self.directory, re.sub(r"[^A-Za-z0-9_.-]", "_", name) + ".json")
+
+    def exists(self, name):
+        return os.path.exists(self._path(name))
+
+    def save(self, summary):
+        """Store a run summary, replacing the file atomically."""
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(summary["name"])
+        with open(path + ".tmp", "w") as f:
+            json.dump(summary, f)
+        os.replace(path + ".tmp", path)
+
+    def load(self, name):
+        """Return the summary of run `name`, or None if it was never saved."""
+        try:
+            with open(self._path(name)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def names(self):
+        """Return the names of all saved runs, oldest first."""
+        if not os.path.isdir(self.directory):
+            return []
+        summaries = []
+        for file_name in os.listdir(self.directory):
+            if file_name.endswith(".json"):
+                try:
+                    with open(os.path.join(self.directory, file_name)) as f:
+                        summary = json.load(f)
+                    summaries.append((summary["finished"] or 0, summary["name"]))
+                except (OSError, ValueError, KeyError, TypeError):
+                    # Not a run summary; leave it out rather than break the listing
+                    continue
+        return [name for _, name in sorted(summaries)]
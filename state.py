@@ -1,21 +1,78 @@
+import threading
+import uuid
+from array import array
 import gradio as gr
+from event_index import EventIndex
+from run_summary import RunSummary
+
+# The sections of the canvas that can change independently.
+# Each one carries a version counter so renders can be cached per section.
+SECTIONS = ("graph", "workspace", "permanent", "task", "volatile", "messages")
 
 # This class will hold the live state of the LLMunix session.
 # Using a class ensures all UI components and tool handlers share the same data.
 class CanvasState:
     def __init__(self):
-        # The agent interaction graph data
-        self.graph = gr.State({"nodes": set(), "edges": []})
-        
-        # The raw data for UI components
-        self.workspace_html = gr.State("")
-        self.permanent_memory_md = gr.State("### Permanent Memory\n---")
-        self.task_memory_md = gr.State("### Task Memory\n---")
-        self.volatile_memory_md = gr.State("### Volatile Memory\n---")
-        self.messages_md = gr.State("### Agent Messages\n---")
-        
+        # Every applied event, stored compactly and indexed for the event query API.
+        # The panels below only keep positions into it and render on demand.
+        self.events = EventIndex()
+
+        # The agent interaction graph: node ids and the number of steps or
+        # messages along each (source, target) edge, all symbols interned in
+        # `events.symbols`
+        self.graph = {"nodes": set(), "edges": {}}
+
+        # The data for UI components: the position of the event each panel
+        # shows, and the text a panel starts from before any event
+        self.workspace_row = None
+        self.memory_base = {
+            "permanent": "### Permanent Memory\n---",
+            "task": "### Task Memory\n---",
+            "volatile": "### Volatile Memory\n---",
+        }
+        self.memory_rows = {tier: array("l") for tier in self.memory_base}
+        self.messages_header = "### Agent Messages\n---"
+        self.message_rows = array("l")
+
+        # Escaped HTML of the current workspace view and of the snapshot entries
+        # each memory tier starts from in the frontend. Message and memory
+        # entries are rendered from `events` when the frontend polls for them.
+        self.workspace_fragment = ""
+        self.memory_base_html = {tier: "" for tier in self.memory_base}
+        self.memory_base_row = {tier: None for tier in self.memory_base}
+
+        # Aggregates of the current run, and of the runs finished since startup
+        # with the sequence number of the event that finished each one
+        self.run = RunSummary()
+        self.finished_runs = {}
+        self.finished_run_seqs = {}
+
         # State JSON for JavaScript frontend
         self.state_json = gr.State("{}")
 
+        # Version counter per section, bumped whenever that section changes
+        self.versions = {section: 0 for section in SECTIONS}
+
+        # Identifies this state in frontend cursors, so a cursor handed out
+        # before a restart is never mistaken for a position in this one
+        self.epoch = uuid.uuid4().hex[:12]
+
+        # Sequence number of the last event applied to this state, and the lock
+        # serializing event application against renders
+        self.last_seq = 0
+        self.lock = threading.RLock()
+
+        # The last frame sequence number ingested from each streaming producer
+        self.producer_seqs = {}
+
+    def touch(self, *sections):
+        """Mark sections as changed so renders built from them are invalidated."""
+        for section in sections:
+            self.versions[section] += 1
+
+    def version(self, *sections):
+        """Return the combined version of one or more sections."""
+        return tuple(self.versions[section] for section in sections)
+
 # Instantiate a single global state object
-canvas_state = CanvasState()
\ No newline at end of file
+canvas_state = CanvasState()
@@ -8,6 +8,7 @@ import requests
 import time
 import json
 import random
+import uuid
 
 def call_mcp_endpoint(endpoint, data):
     """Call a MCP endpoint on the Gradio server"""
@@ -24,6 +25,34 @@ def call_mcp_endpoint(endpoint, data):
         print(f"Error calling {endpoint}: {response.status_code}")
         print(response.text)
 
+def stream_mcp_events(calls, producer=None, batch_size=100):
+    """Stream (endpoint, data) calls over the WebSocket ingestion channel, resuming after drops"""
+    from websockets.sync.client import connect
+    from websockets.exceptions import ConnectionClosed
+
+    # The server remembers the last frame of each producer, so use a fresh id per stream
+    producer = producer or f"test-{uuid.uuid4()}"
+    frames = [{"seq": seq, "tool": endpoint, "data": data} for seq, (endpoint, data) in enumerate(calls, 1)]
+    acked = 0
+
+    while acked < len(frames):
+        try:
+            with connect(f"ws://localhost:7860/ingest?producer={producer}") as websocket:
+                # Resend everything after the last frame the server ingested
+                acked = json.loads(websocket.recv())["resume_from"]
+                for start in range(acked, len(frames), batch_size):
+                    websocket.send(json.dumps(frames[start:start + batch_size]))
+                    reply = json.loads(websocket.recv())
+                    if "error" in reply:
+                        print(f"Error streaming events: {reply['error']}")
+                        return
+                    acked = reply["ack"]
+        except (OSError, ConnectionClosed) as e:
+            print(f"Connection dropped ({e}), resuming after frame {acked}")
+            time.sleep(1)
+
+    print(f"Streamed {len(frames)} events as {producer}")
+
 def send_initial_state_snapshot():
     """Send a full snapshot of the system state to initialize the UI"""
     print("Sending initial state snapshot...")
@@ -227,10 +256,28 @@ def run_advanced_simulation():
     # working in parallel on different tasks
     pass
 
+def run_streaming_simulation(count=10000):
+    """Stream a burst of agent events over the WebSocket ingestion channel"""
+    agents = ["SystemAgent", "SearchAgent", "CodeAgent"]
+    tools = ["search_web", "read_file", "write_file", "run_code"]
+    calls = []
+    for i in range(count):
+        agent = random.choice(agents)
+        if i % 2 == 0:
+            calls.append(("canvas_report_step", [agent, f"Working on step {i}", f"{random.choice(tools)}('{i}')"]))
+        else:
+            calls.append(("canvas_report_message_sent", [agent, random.choice(agents), f"Result of step {i}", "normal"]))
+
+    start = time.time()
+    stream_mcp_events(calls)
+    print(f"{count / (time.time() - start):.0f} events/s")
+
 if __name__ == "__main__":
     import sys
     
     if len(sys.argv) > 1 and sys.argv[1] == "--advanced":
         run_advanced_simulation()
+    elif len(sys.argv) > 1 and sys.argv[1] == "--stream":
+        run_streaming_simulation()
     else:
         simulate_agent_workflow()
\ No newline at end of file